@@ -4,9 +4,10 @@ import json
 import sqlite3
 from werkzeug.utils import secure_filename
 from dotenv import load_dotenv
-from utils.db import init_db, get_db_connection
+from utils.db import init_db, get_db_connection, get_user_stats, record_ai_calls
 from utils.auth import register_user, authenticate_user
-from utils.gemini import analyze_image, generate_full_recipe_details, chat_with_chef
+from utils.gemini import analyze_image, generate_full_recipe_details, chat_with_chef, ai_enabled
+from utils.similarity import index_recipe, similar_recipes, start_index_build
 
 load_dotenv()
 
@@ -24,10 +25,41 @@ try:
 except Exception as e:
     print(f"Error initializing DB: {e}")
 
+# Similar-recipe index loads in the background; pages show no suggestions until it's ready
+start_index_build()
+
 def allowed_file(filename):
     return '.' in filename and \
            filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+def track_ai_call(user_id):
+    # Bookkeeping only: a failed counter write must never fail the AI feature itself
+    if user_id is None or not ai_enabled():
+        return
+    conn = get_db_connection()
+    try:
+        record_ai_calls(conn, user_id)
+        conn.commit()
+    except sqlite3.Error as e:
+        print(f"Error recording AI call: {e}")
+    finally:
+        conn.close()
+
+def get_similar_recipes(conn, recipe_id, k=6):
+    ranked = similar_recipes(recipe_id, k)
+    if not ranked:
+        return []
+    ids = [rid for rid, _ in ranked]
+    placeholders = ','.join('?' * len(ids))
+    rows = conn.execute(f'SELECT id, dish_name, cuisine_type, image_path FROM recipes WHERE id IN ({placeholders})', ids).fetchall()
+    by_id = {row['id']: dict(row) for row in rows}
+    results = []
+    for rid, score in ranked:
+        if rid in by_id:
+            by_id[rid]['score'] = round(score, 3)
+            results.append(by_id[rid])
+    return results
+
 # --- Routes ---
 
 @app.route('/')
@@ -40,7 +72,10 @@ def index():
 def dashboard():
     if 'user_id' not in session:
         return redirect(url_for('login'))
-    return render_template('dashboard.html', user_name=session.get('user_name'))
+    conn = get_db_connection()
+    stats = get_user_stats(conn, session['user_id'])
+    conn.close()
+    return render_template('dashboard.html', user_name=session.get('user_name'), stats=stats)
 
 @app.route('/upload', methods=['POST'])
 def upload_file():
@@ -59,6 +94,7 @@ def upload_file():
     file.save(filepath)
     
     vision_data = analyze_image(filepath)
+    track_ai_call(session['user_id'])
     if not vision_data or 'dish_name' not in vision_data:
         flash('Could not identify food.', 'danger')
         return redirect(url_for('dashboard'))
@@ -68,6 +104,7 @@ def upload_file():
     category = vision_data.get('category')
     
     recipe_data = generate_full_recipe_details(dish_name, cuisine)
+    track_ai_call(session['user_id'])
     if not recipe_data:
         flash('Error generating recipe.', 'danger')
         return redirect(url_for('dashboard'))
@@ -101,6 +138,7 @@ def upload_file():
     
     conn.commit()
     conn.close()
+    index_recipe(recipe_id, recipe_data['english']['ingredients'])
     return redirect(url_for('view_recipe', id=recipe_id))
 
 @app.route('/recipe/<int:id>')
@@ -121,6 +159,7 @@ def view_recipe(id):
                           (session['user_id'], id)).fetchone()
         is_favorite = True if fav else False
     
+    similar = get_similar_recipes(conn, id)
     conn.close()
     
     # Parse JSON fields for template use
@@ -141,7 +180,15 @@ def view_recipe(id):
     except Exception as e:
         print(f"Error parsing recipe JSON: {e}")
 
-    return render_template('recipe.html', recipe=r_dict, nutrition=nutrition, is_favorite=is_favorite)
+    return render_template('recipe.html', recipe=r_dict, nutrition=nutrition, is_favorite=is_favorite, similar=similar)
+
+@app.route('/api/recipe/<int:id>/similar')
+def api_similar_recipes(id):
+    k = min(max(request.args.get('k', 6, type=int), 1), 50)
+    conn = get_db_connection()
+    results = get_similar_recipes(conn, id, k)
+    conn.close()
+    return jsonify({'recipe_id': id, 'similar': results})
 
 @app.route('/history')
 def history():
@@ -194,6 +241,7 @@ def chat():
         return jsonify({'response': "I didn't catch that."})
         
     response = chat_with_chef(message, recipe_context)
+    track_ai_call(session.get('user_id'))
     return jsonify({'response': response})
 
 @app.route('/shopping-list')
@@ -322,6 +370,7 @@ def add_recipe():
         
         conn.commit()
         conn.close()
+        index_recipe(recipe_id, ingredients)
         return redirect(url_for('view_recipe', id=recipe_id))
         
     return render_template('recipe_form.html', recipe=None)
@@ -358,6 +407,7 @@ def edit_recipe(id):
         ))
         conn.commit()
         conn.close()
+        index_recipe(id, ingredients)
         flash('Recipe updated successfully!', 'success')
         return redirect(url_for('view_recipe', id=id))
 
@@ -386,11 +436,10 @@ def profile():
         flash('Profile updated!', 'success')
     
     user = conn.execute('SELECT * FROM users WHERE id = ?', (session['user_id'],)).fetchone()
-    recipes_count = conn.execute('SELECT COUNT(*) FROM recipes WHERE user_id = ?', (session['user_id'],)).fetchone()[0]
-    favorites_count = conn.execute('SELECT COUNT(*) FROM favorites WHERE user_id = ?', (session['user_id'],)).fetchone()[0]
+    stats = get_user_stats(conn, session['user_id'])
     
     conn.close()
-    return render_template('profile.html', user=user, recipes_count=recipes_count, favorites_count=favorites_count)
+    return render_template('profile.html', user=user, stats=stats)
 
 if __name__ == '__main__':
     app.run(debug=True)
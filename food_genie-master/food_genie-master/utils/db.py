@@ -1,8 +1,73 @@
 import sqlite3
 import os
+import sys
 
 DB_NAME = "database.db"
 
+STATS_SCHEMA_VERSION = 1
+
+STATS_TRIGGERS = {
+    'users_stats_insert': '''
+        CREATE TRIGGER users_stats_insert AFTER INSERT ON users
+        BEGIN
+            INSERT OR IGNORE INTO user_stats (user_id) VALUES (NEW.id);
+        END
+    ''',
+    'recipes_stats_insert': '''
+        CREATE TRIGGER recipes_stats_insert AFTER INSERT ON recipes
+        BEGIN
+            INSERT OR IGNORE INTO user_stats (user_id) VALUES (NEW.user_id);
+            UPDATE user_stats SET recipes_count = recipes_count + 1,
+                last_upload_at = MAX(COALESCE(last_upload_at, NEW.created_at), NEW.created_at)
+            WHERE user_id = NEW.user_id;
+        END
+    ''',
+    'recipes_stats_delete': '''
+        CREATE TRIGGER recipes_stats_delete AFTER DELETE ON recipes
+        BEGIN
+            UPDATE user_stats SET recipes_count = recipes_count - 1,
+                last_upload_at = (SELECT MAX(created_at) FROM recipes WHERE user_id = OLD.user_id)
+            WHERE user_id = OLD.user_id;
+        END
+    ''',
+    'favorites_stats_insert': '''
+        CREATE TRIGGER favorites_stats_insert AFTER INSERT ON favorites
+        BEGIN
+            INSERT OR IGNORE INTO user_stats (user_id) VALUES (NEW.user_id);
+            UPDATE user_stats SET favorites_count = favorites_count + 1 WHERE user_id = NEW.user_id;
+        END
+    ''',
+    'favorites_stats_delete': '''
+        CREATE TRIGGER favorites_stats_delete AFTER DELETE ON favorites
+        BEGIN
+            UPDATE user_stats SET favorites_count = favorites_count - 1 WHERE user_id = OLD.user_id;
+        END
+    ''',
+    'shopping_stats_insert': '''
+        CREATE TRIGGER shopping_stats_insert AFTER INSERT ON shopping_list
+        BEGIN
+            INSERT OR IGNORE INTO user_stats (user_id) VALUES (NEW.user_id);
+            UPDATE user_stats SET shopping_pending = shopping_pending + (NOT COALESCE(NEW.is_checked, 0))
+            WHERE user_id = NEW.user_id;
+        END
+    ''',
+    'shopping_stats_delete': '''
+        CREATE TRIGGER shopping_stats_delete AFTER DELETE ON shopping_list
+        BEGIN
+            UPDATE user_stats SET shopping_pending = shopping_pending - (NOT COALESCE(OLD.is_checked, 0))
+            WHERE user_id = OLD.user_id;
+        END
+    ''',
+    'shopping_stats_toggle': '''
+        CREATE TRIGGER shopping_stats_toggle AFTER UPDATE OF is_checked ON shopping_list
+        WHEN (NOT COALESCE(OLD.is_checked, 0)) != (NOT COALESCE(NEW.is_checked, 0))
+        BEGIN
+            UPDATE user_stats SET shopping_pending = shopping_pending + (NOT COALESCE(NEW.is_checked, 0)) - (NOT COALESCE(OLD.is_checked, 0))
+            WHERE user_id = NEW.user_id;
+        END
+    ''',
+}
+
 def get_db_connection():
     conn = sqlite3.connect(DB_NAME)
     conn.row_factory = sqlite3.Row
@@ -81,9 +146,84 @@ def init_db():
         )
     ''')
 
+    # Per-user lookups used by the stats triggers and rebuild_user_stats
+    c.execute('CREATE INDEX IF NOT EXISTS idx_recipes_user ON recipes (user_id, created_at)')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_favorites_user ON favorites (user_id)')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_shopping_list_user ON shopping_list (user_id)')
+
+    # Per-user counters [NEW] - kept current by STATS_TRIGGERS so the
+    # profile and dashboard don't have to COUNT(*) a user's whole history.
+    # Bump STATS_SCHEMA_VERSION whenever the table or a trigger body changes:
+    # older databases then drop and recreate every stats trigger and recount,
+    # all in one transaction, so a crash can't leave half-migrated counters.
+    version = c.execute('PRAGMA user_version').fetchone()[0]
+    if version < STATS_SCHEMA_VERSION:
+        c.execute('BEGIN')
+        try:
+            c.execute('''
+                CREATE TABLE IF NOT EXISTS user_stats (
+                    user_id INTEGER PRIMARY KEY,
+                    recipes_count INTEGER NOT NULL DEFAULT 0,
+                    favorites_count INTEGER NOT NULL DEFAULT 0,
+                    shopping_pending INTEGER NOT NULL DEFAULT 0,
+                    last_upload_at TIMESTAMP,
+                    ai_calls INTEGER NOT NULL DEFAULT 0,
+                    FOREIGN KEY (user_id) REFERENCES users (id)
+                )
+            ''')
+            for name, sql in STATS_TRIGGERS.items():
+                c.execute(f'DROP TRIGGER IF EXISTS {name}')
+                c.execute(sql)
+            _recount_user_stats(c)
+            c.execute(f'PRAGMA user_version = {STATS_SCHEMA_VERSION}')
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            conn.close()
+            raise
+
     conn.commit()
     conn.close()
     print("Database initialized successfully.")
 
+def _recount_user_stats(c):
+    c.execute('''
+        INSERT OR IGNORE INTO user_stats (user_id) SELECT id FROM users
+    ''')
+    c.execute('''
+        UPDATE user_stats SET
+            recipes_count = (SELECT COUNT(*) FROM recipes r WHERE r.user_id = user_stats.user_id),
+            last_upload_at = (SELECT MAX(created_at) FROM recipes r WHERE r.user_id = user_stats.user_id),
+            favorites_count = (SELECT COUNT(*) FROM favorites f WHERE f.user_id = user_stats.user_id),
+            shopping_pending = (SELECT COUNT(*) FROM shopping_list s
+                                WHERE s.user_id = user_stats.user_id AND NOT COALESCE(s.is_checked, 0))
+    ''')
+
+def rebuild_user_stats():
+    """
+    Recomputes user_stats from the source tables, fixing any drift.
+    ai_calls has no source table, so its current value is kept.
+    """
+    conn = get_db_connection()
+    _recount_user_stats(conn)
+    conn.commit()
+    conn.close()
+    print("User stats rebuilt.")
+
+def get_user_stats(conn, user_id):
+    stats = conn.execute('SELECT * FROM user_stats WHERE user_id = ?', (user_id,)).fetchone()
+    if stats is None:
+        return {'recipes_count': 0, 'favorites_count': 0, 'shopping_pending': 0,
+                'last_upload_at': None, 'ai_calls': 0}
+    return dict(stats)
+
+def record_ai_calls(conn, user_id, count=1):
+    conn.execute('INSERT OR IGNORE INTO user_stats (user_id) VALUES (?)', (user_id,))
+    conn.execute('UPDATE user_stats SET ai_calls = ai_calls + ? WHERE user_id = ?', (count, user_id))
+
 if __name__ == "__main__":
-    init_db()
+    # python -m utils.db rebuild-stats  -> repair counters without touching the schema
+    if len(sys.argv) > 1 and sys.argv[1] == "rebuild-stats":
+        rebuild_user_stats()
+    else:
+        init_db()
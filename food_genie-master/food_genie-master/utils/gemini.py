@@ -17,6 +17,12 @@ if API_KEY:
 VISION_MODEL = 'gemini-1.5-flash'
 TEXT_MODEL = 'gemini-1.5-flash'
 
+def ai_enabled():
+    """
+    True when an API key is configured, i.e. the helpers below actually call the model.
+    """
+    return client is not None
+
 def analyze_image(image_path):
     """
     Analyzes the food image to identify the dish using the new SDK.
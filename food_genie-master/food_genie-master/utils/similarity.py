@@ -0,0 +1,239 @@
+import heapq
+import json
+import math
+import re
+import threading
+import time
+from collections import defaultdict
+from itertools import islice
+from utils.db import get_db_connection
+
+# Words that describe quantities or preparation rather than the ingredient itself
+STOP_WORDS = {
+    'a', 'an', 'and', 'or', 'of', 'to', 'for', 'the', 'as', 'in', 'into', 'with', 'per',
+    'cup', 'cups', 'tbsp', 'tsp', 'tablespoon', 'tablespoons', 'teaspoon', 'teaspoons',
+    'g', 'gm', 'gms', 'gram', 'grams', 'kg', 'ml', 'l', 'litre', 'liter', 'oz', 'lb', 'lbs',
+    'pinch', 'handful', 'piece', 'pieces', 'slice', 'slices', 'clove', 'cloves', 'inch',
+    'small', 'medium', 'large', 'big', 'few', 'some', 'optional', 'needed', 'taste',
+    'chopped', 'finely', 'sliced', 'diced', 'minced', 'grated', 'crushed', 'fresh',
+    'washed', 'soaked', 'peeled', 'boiled', 'cut', 'whole', 'required', 'about',
+}
+
+# Common tokens (salt, oil, water...) have the longest posting lists and the lowest
+# weights, so only postings up to this size are scanned to find candidates. Larger
+# ones are still scored, but by checking each candidate's token set instead. When the
+# rare tokens turn up fewer than k candidates, more are drawn from the common postings
+# (see _common_candidates), capped at MAX_CANDIDATE_POSTING ids.
+MAX_CANDIDATE_POSTING = 2000
+
+# IDF weights are fixed when the index is built so stored norms always match the
+# weights used at query time (identical recipes score exactly 1.0). Once inserts and
+# edits since the last build pass this share of the indexed recipes, a fresh build
+# runs in the background to pick up the new document frequencies.
+REBUILD_RATIO = 0.1
+REBUILD_MIN_CHANGES = 100
+
+# After a failed build, wait this long before a query may start another one
+BUILD_RETRY_SECONDS = 300
+
+_lock = threading.Lock()
+_built = False
+_building = False
+_failed_at = None                 # time.time() of the last failed build
+_pending = {}                     # recipe_id -> ingredients, queued while a build runs
+_changes = 0                      # inserts/edits since the last build
+_doc_tokens = {}                  # recipe_id -> set of tokens
+_doc_norms = {}                   # recipe_id -> TF-IDF vector length
+_postings = defaultdict(set)      # token -> set of recipe_ids
+_idf_table = {}                   # token -> IDF at build time
+_unseen_idf = 1.0                 # IDF for tokens that first appeared after the build
+
+def normalize_ingredients(ingredients):
+    """
+    Turns a list of free-text ingredient lines into a set of normalized tokens.
+    """
+    tokens = set()
+    for line in ingredients or []:
+        for word in re.findall(r'[a-z]+', str(line).lower()):
+            if len(word) < 2 or word in STOP_WORDS:
+                continue
+            if len(word) > 3 and word.endswith('es') and word[:-2].endswith(('o', 'ch', 'sh')):
+                word = word[:-2]
+            elif len(word) > 3 and word.endswith('s') and not word.endswith('ss'):
+                word = word[:-1]
+            tokens.add(word)
+    return tokens
+
+def _parse_ingredients(raw):
+    try:
+        return json.loads(raw) if raw else []
+    except (ValueError, TypeError):
+        return []
+
+def _idf(token):
+    return _idf_table.get(token, _unseen_idf)
+
+def _norm(tokens):
+    return math.sqrt(sum(_idf(t) ** 2 for t in tokens))
+
+def _add(recipe_id, tokens):
+    _doc_tokens[recipe_id] = tokens
+    for token in tokens:
+        _postings[token].add(recipe_id)
+    _doc_norms[recipe_id] = _norm(tokens)
+
+def _remove(recipe_id):
+    tokens = _doc_tokens.pop(recipe_id, None)
+    _doc_norms.pop(recipe_id, None)
+    for token in tokens or ():
+        posting = _postings.get(token)
+        if posting is not None:
+            posting.discard(recipe_id)
+            if not posting:
+                del _postings[token]
+
+def build_index():
+    """
+    Loads every recipe's ingredients from the database and swaps in a fresh index.
+    The current index keeps serving queries while this runs; updates that arrive
+    in the meantime are queued and replayed on top of the new one.
+    """
+    global _built, _building, _failed_at, _changes, _doc_tokens, _doc_norms, _postings, _idf_table, _unseen_idf
+    try:
+        conn = get_db_connection()
+        rows = conn.execute('SELECT id, ingredients_en FROM recipes').fetchall()
+        conn.close()
+
+        doc_tokens = {}
+        postings = defaultdict(set)
+        for row in rows:
+            tokens = normalize_ingredients(_parse_ingredients(row['ingredients_en']))
+            doc_tokens[row['id']] = tokens
+            for token in tokens:
+                postings[token].add(row['id'])
+
+        n = len(doc_tokens)
+        idf_table = {t: math.log((1 + n) / (1 + len(ids))) + 1 for t, ids in postings.items()}
+        unseen_idf = math.log((1 + n) / 2) + 1
+        doc_norms = {
+            rid: math.sqrt(sum(idf_table[t] ** 2 for t in tokens))
+            for rid, tokens in doc_tokens.items()
+        }
+
+        with _lock:
+            _doc_tokens, _doc_norms, _postings = doc_tokens, doc_norms, postings
+            _idf_table, _unseen_idf = idf_table, unseen_idf
+            for recipe_id, ingredients in _pending.items():
+                _remove(recipe_id)
+                _add(recipe_id, normalize_ingredients(ingredients))
+            _pending.clear()
+            _changes = 0
+            _built = True
+            _failed_at = None
+    except Exception as e:
+        print(f"Error building similarity index: {e}")
+        with _lock:
+            _failed_at = time.time()
+    finally:
+        with _lock:
+            _building = False
+_failed_at = None                 # time.time() of the last failed build
+
+def _start_build_locked():
+    global _building
+    if _building:
+        return
+    if _failed_at is not None and time.time() - _failed_at < BUILD_RETRY_SECONDS:
+        return
+    _building = True
+    threading.Thread(target=build_index, daemon=True).start()
+
+def start_index_build():
+    """
+    Builds the index in a background thread. Only one build runs at a time;
+    until the first one finishes, similar_recipes returns no suggestions.
+    """
+    with _lock:
+        _start_build_locked()
+
+def index_recipe(recipe_id, ingredients):
+    """
+    Adds or replaces a single recipe in the index after an insert or edit.
+    """
+    global _changes
+    with _lock:
+        if _building:
+            _pending[recipe_id] = ingredients
+        if not _built:
+            return
+        _remove(recipe_id)
+        _add(recipe_id, normalize_ingredients(ingredients))
+        _changes += 1
+        if _changes > max(REBUILD_MIN_CHANGES, len(_doc_tokens) * REBUILD_RATIO):
+            _start_build_locked()
+
+def _common_candidates(tokens, k):
+    """
+    Picks candidates from the postings of common tokens (rarest first) by
+    intersecting them while more than MAX_CANDIDATE_POSTING recipes remain, so
+    the ids kept are the ones sharing the most of those tokens. Stops narrowing
+    before the set would drop to k or fewer, topping it up from the previous,
+    wider set. Whatever still exceeds the cap is cut at an arbitrary point.
+    """
+    candidates = _postings.get(tokens[0], set())
+    best = []
+    for token in tokens[1:]:
+        if len(candidates) <= MAX_CANDIDATE_POSTING:
+            break
+        narrowed = candidates & _postings.get(token, set())
+        if len(narrowed) <= k:
+            best = list(narrowed)
+            break
+        candidates = narrowed
+    return best + list(islice(candidates, MAX_CANDIDATE_POSTING))
+
+def similar_recipes(recipe_id, k=6):
+    """
+    Returns up to k (recipe_id, score) pairs ranked by cosine similarity of
+    ingredient TF-IDF vectors. Recipes sharing a rare token are always scored.
+    If those are fewer than k, the rest come from _common_candidates. In that
+    case the result is approximate: it is the top k of at most
+    MAX_CANDIDATE_POSTING recipes with the most common tokens in common, not
+    of every recipe.
+    """
+    with _lock:
+        if not _built:
+            _start_build_locked()
+            return []
+        tokens = _doc_tokens.get(recipe_id)
+        query_norm = _doc_norms.get(recipe_id)
+        if not tokens or not query_norm:
+            return []
+
+        by_df = sorted(tokens, key=lambda t: len(_postings.get(t, ())))
+        scan = [t for t in by_df if len(_postings.get(t, ())) <= MAX_CANDIDATE_POSTING]
+        check = [t for t in by_df if t not in scan]
+
+        scores = defaultdict(float)
+        for token in scan:
+            weight = _idf(token) ** 2
+            for other_id in _postings.get(token, ()):
+                if other_id != recipe_id:
+                    scores[other_id] += weight
+        if len(scores) < k and check:
+            for other_id in _common_candidates(check, k + 1):
+                if other_id != recipe_id:
+                    scores.setdefault(other_id, 0.0)
+        if check:
+            weights = [(t, _idf(t) ** 2) for t in check]
+            for other_id in scores:
+                other_tokens = _doc_tokens[other_id]
+                scores[other_id] += sum(w for t, w in weights if t in other_tokens)
+
+        ranked = []
+        for other_id, dot in scores.items():
+            norm = _doc_norms.get(other_id)
+            if norm:
+                ranked.append((other_id, dot / (query_norm * norm)))
+
+    return heapq.nlargest(k, ranked, key=lambda pair: (pair[1], -pair[0]))